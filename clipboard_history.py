@@ -0,0 +1,191 @@
+import hashlib
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("digest", "timestamp", "data", "compressed", "preview", "size")
+
+    PREVIEW_LENGTH = 256
+
+    def __init__(self, text: str, digest: str):
+        self.digest = digest
+        self.timestamp = time.time()
+        self.data = text.encode("utf-8")
+        self.compressed = False
+        # Uncompressed start of the text so prefix searches never need to decompress
+        self.preview = text[:self.PREVIEW_LENGTH]
+        self.size = len(self.data)
+
+    def text(self) -> str:
+        data = zlib.decompress(self.data) if self.compressed else self.data
+        return data.decode("utf-8")
+
+    def compress(self):
+        if self.compressed:
+            return
+        packed = zlib.compress(self.data, 6)
+        if len(packed) < len(self.data):
+            self.data = packed
+            self.compressed = True
+            self.size = len(packed)
+
+
+class ClipboardHistory:
+    """Fixed-size ring of recent clipboard contents, deduplicated by content hash.
+
+    Item 1 is the most recent entry. Entries older than `compress_after` are
+    zlib-compressed, and the oldest entries are dropped whenever the stored
+    size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_entries: int = 50, max_bytes: int = 1024 * 1024,
+                 max_entry_bytes: int = 256 * 1024, compress_after: int = 5, compress_min_bytes: int = 1024):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.compress_after = compress_after
+        self.compress_min_bytes = compress_min_bytes
+        self._slots: List[Optional[_Entry]] = [None] * max_entries
+        self._head = 0  # Next slot to write
+        self._by_digest: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_digest)
+
+    def add(self, text: str):
+        if not text:
+            return
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            slot = self._by_digest.get(digest)
+            if slot is not None and slot == (self._head - 1) % self.max_entries:
+                self._slots[slot].timestamp = time.time()
+                return
+            if slot is not None:
+                # Seen before: drop the old copy so the text moves to the front
+                self._remove(slot)
+            entry = _Entry(text, digest)
+            if entry.size > self.max_entry_bytes:
+                entry.compress()
+                if entry.size > self.max_entry_bytes:
+                    print(f"Clipboard history: skipping {entry.size} byte entry")
+                    return
+
+            if self._slots[self._head] is not None:
+                self._drop(self._head)
+            self._slots[self._head] = entry
+            self._by_digest[digest] = self._head
+            self._bytes += entry.size
+            self._head = (self._head + 1) % self.max_entries
+
+            # Only the entry that just aged past the threshold needs compressing
+            aged = self._slots[(self._head - 1 - self.compress_after) % self.max_entries]
+            if aged is not None and aged is not entry and aged.size >= self.compress_min_bytes:
+                self._bytes -= aged.size
+                aged.compress()
+                self._bytes += aged.size
+
+            # Evict from the oldest end until the size limit holds again
+            oldest = self._head
+            while self._bytes > self.max_bytes and len(self._by_digest) > 1:
+                if self._slots[oldest] is not None:
+                    self._drop(oldest)
+                oldest = (oldest + 1) % self.max_entries
+
+    def _drop(self, slot: int):
+        entry = self._slots[slot]
+        self._slots[slot] = None
+        self._bytes -= entry.size
+        del self._by_digest[entry.digest]
+
+    def _remove(self, slot: int):
+        # Shift the newer entries back one slot so the ring never has gaps and
+        # `max_entries` stays the number of distinct entries kept
+        self._drop(slot)
+        newest = (self._head - 1) % self.max_entries
+        while slot != newest:
+            following = (slot + 1) % self.max_entries
+            entry = self._slots[following]
+            self._slots[slot] = entry
+            self._by_digest[entry.digest] = slot
+            slot = following
+        self._slots[newest] = None
+        self._head = newest
+
+    def _entries(self):
+        # Newest first, skipping the empty slots left by size eviction
+        for offset in range(1, self.max_entries + 1):
+            entry = self._slots[(self._head - offset) % self.max_entries]
+            if entry is not None:
+                yield entry
+
+    def get(self, n: int) -> Optional[str]:
+        """Return history item `n` (1 is the most recent)."""
+        with self._lock:
+            for position, entry in enumerate(self._entries(), start=1):
+                if position == n:
+                    return entry.text()
+        return None
+
+    def search(self, query: str, prefix: bool = False, limit: int = 10) -> List[Tuple[int, str]]:
+        """Return up to `limit` (item number, text) pairs containing or starting with `query`."""
+        query_lower = query.lower()
+        results = []
+        with self._lock:
+            for position, entry in enumerate(self._entries(), start=1):
+                if prefix and len(query) <= len(entry.preview):
+                    if not entry.preview.lower().startswith(query_lower):
+                        continue
+                    text = entry.text()
+                else:
+                    text = entry.text()
+                    haystack = text.lower()
+                    if not (haystack.startswith(query_lower) if prefix else query_lower in haystack):
+                        continue
+                results.append((position, text))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def stats(self) -> str:
+        return f"{len(self._by_digest)} entries, {self._bytes} bytes"
+
+
+def watch_clipboard(on_change: Callable[[], None]) -> bool:
+    """Call `on_change` whenever another program takes ownership of the X11 clipboard.
+
+    Uses XFixes selection notifications, so nothing is polled. Returns False
+    when notifications are not available (not X11, or no python-xlib/XFixes).
+    """
+    try:
+        from Xlib import display as xdisplay
+        from Xlib.ext import xfixes
+        connection = xdisplay.Display()
+        if not connection.has_extension("XFIXES"):
+            return False
+        connection.xfixes_query_version()
+        clipboard = connection.get_atom("CLIPBOARD")
+        connection.xfixes_select_selection_input(connection.screen().root, clipboard,
+                                                 xfixes.XFixesSetSelectionOwnerNotifyMask)
+    except Exception as e:
+        print(f"Clipboard notifications are not available: {e}")
+        return False
+
+    def run():
+        while True:
+            event = connection.next_event()
+            if (event.type, getattr(event, "sub_code", None)) == connection.extension_event.SetSelectionOwnerNotify:
+                try:
+                    on_change()
+                except Exception as e:
+                    print(f"Error recording clipboard change: {e}")
+
+    threading.Thread(target=run, name="clipboard-watcher", daemon=True).start()
+    return True
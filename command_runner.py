@@ -0,0 +1,251 @@
+import json
+import os
+import platform
+import queue
+import select
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+# Source for the persistent Python worker. It reads one JSON job per line,
+# runs the snippet (or script path) with the job input on stdin and replies
+# with a single JSON line, so the interpreter only starts once per worker.
+# The job and reply pipes are moved off fds 0 and 1, which instead point at
+# per-job files, so subprocesses and os.write(1, ...) cannot corrupt replies.
+PYTHON_WORKER_SOURCE = r'''
+import io, json, os, runpy, sys, tempfile, traceback
+jobs = os.fdopen(os.dup(0), "r", encoding="utf-8")
+replies = os.fdopen(os.dup(1), "w", encoding="utf-8")
+stdin_file, stdout_file = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+os.dup2(stdin_file.fileno(), 0)
+os.dup2(stdout_file.fileno(), 1)
+real_stdout = sys.stdout
+for line in jobs:
+    job = json.loads(line)
+    data = job["input"].encode("utf-8")
+    stdin_file.seek(0)
+    stdin_file.truncate()
+    stdin_file.write(data)
+    stdin_file.flush()
+    stdin_file.seek(0)
+    stdout_file.seek(0)
+    stdout_file.truncate()
+    status = 0
+    sys.stdin = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
+    try:
+        command = job["command"]
+        if command.endswith(".py") and os.path.isfile(command):
+            sys.argv = [command]
+            runpy.run_path(command, run_name="__main__")
+        else:
+            exec(compile(command, "<run_command>", "exec"), {"__name__": "__main__", "text": job["input"]})
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stdout = real_stdout
+        sys.stdout.flush()
+    stdout_file.seek(0)
+    output = stdout_file.read().decode("utf-8", errors="replace")
+    replies.write(json.dumps({"status": status, "stdout": output}) + "\n")
+    replies.flush()
+'''
+
+
+def quote_value(value: str, runtime: str = "sh") -> str:
+    """Quote a variable value so it lands in a command as one literal argument."""
+    if runtime == "python":
+        return repr(value)
+    if platform.system() == "Windows":
+        # cmd.exe leaves & | < > alone inside double quotes; "" keeps a quote literal
+        return '"' + value.replace('"', '""') + '"'
+    return shlex.quote(value)
+
+
+class CommandError(Exception):
+    pass
+
+
+class CommandTimeout(CommandError):
+    pass
+
+
+class _Worker:
+    """A long-lived interpreter process that runs one job at a time."""
+
+    def __init__(self, runtime: str):
+        self.runtime = runtime
+        self.process: Optional[subprocess.Popen] = None
+        self._buffer = b""
+
+    def start(self):
+        if self.runtime == "python":
+            args = [sys.executable, "-u", "-c", PYTHON_WORKER_SOURCE]
+        else:
+            args = [shutil.which("sh") or "/bin/sh"]
+        # Own session so a timed out job can be killed together with its children
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self._buffer = b""
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.process = None
+
+    def run(self, command: str, input_text: str, timeout: float) -> Tuple[int, str]:
+        """Run one job and return its exit status and stdout."""
+        if not self.alive():
+            self.start()
+
+        if self.runtime == "python":
+            request = json.dumps({"command": command, "input": input_text}) + "\n"
+            self._send(request)
+            try:
+                reply = json.loads(self._read_until(b"\n", timeout))
+                status, stdout = int(reply["status"]), reply["stdout"]
+            except (ValueError, KeyError, TypeError) as e:
+                raise CommandError(f"Unreadable reply from python worker: {e}")
+        else:
+            token = f"__SMART_ACTIONS_{uuid.uuid4().hex}__"
+            # Feed the input through a quoted heredoc so nothing in it is expanded,
+            # then print a unique marker with the exit status after the output
+            if not input_text or input_text.endswith("\n"):
+                script = f"( {command}\n) <<'{token}'\n{input_text}{token}\n"
+            else:
+                # A heredoc always ends in a newline; cut it off so the command sees the exact bytes
+                script = (
+                    f"{{ head -c {len(input_text.encode())} <<'{token}'\n{input_text}\n{token}\n"
+                    f"}} | ( {command}\n)\n"
+                )
+            script += f"printf '\\n{token} %d\\n' $?\n"
+            self._send(script)
+            data = self._read_until(f"\n{token} ".encode(), timeout)
+            status_line = self._read_until(b"\n", timeout)
+            stdout, status = data, int(status_line)
+        return status, stdout
+
+    def _send(self, text: str):
+        try:
+            self.process.stdin.write(text.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise CommandError(f"Worker is not accepting input: {e}")
+
+    def _read_until(self, marker: bytes, timeout: float) -> str:
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while marker not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandTimeout(f"Command timed out after {timeout} seconds")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise CommandError("Worker exited unexpectedly")
+            self._buffer += chunk
+        data, self._buffer = self._buffer.split(marker, 1)
+        return data.decode(errors="replace")
+
+
+class WorkerPool:
+    """Pre-spawned workers for `run_command` steps, keyed by runtime ("sh" or "python")."""
+
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._idle: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supported() -> bool:
+        # Persistent workers rely on select() over pipes, which Windows lacks
+        return platform.system() != "Windows"
+
+    def prespawn(self, runtime: str = "sh"):
+        self._queue(runtime)
+
+    def _queue(self, runtime: str) -> queue.Queue:
+        with self._lock:
+            if runtime not in self._idle:
+                idle = queue.Queue()
+                for _ in range(self.size):
+                    worker = _Worker(runtime)
+                    worker.start()
+                    idle.put(worker)
+                self._idle[runtime] = idle
+            return self._idle[runtime]
+
+    def run(self, command: str, input_text: str = "", timeout: float = 10.0, runtime: str = "sh") -> str:
+        if not self.supported():
+            return self._run_once(command, input_text, timeout, runtime)
+
+        idle = self._queue(runtime)
+        worker = idle.get()
+        try:
+            status, stdout = worker.run(command, input_text, timeout)
+        except Exception:
+            # Timed out, dead or out of sync: the worker may be mid-job, so throw it
+            # away and respawn on next use
+            worker.close()
+            raise
+        finally:
+            idle.put(worker)
+        # A non-zero exit finished the protocol cleanly, so the worker stays in the pool
+        if status != 0:
+            raise CommandError(f"Command exited with status {status}")
+        return stdout
+
+    def _run_once(self, command: str, input_text: str, timeout: float, runtime: str) -> str:
+        if runtime == "python":
+            args = [sys.executable, "-c", command]
+        else:
+            args = command
+        try:
+            result = subprocess.run(
+                args,
+                input=input_text,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                shell=runtime != "python",
+            )
+        except subprocess.TimeoutExpired:
+            raise CommandTimeout(f"Command timed out after {timeout} seconds")
+        if result.returncode != 0:
+            raise CommandError(f"Command exited with status {result.returncode}")
+        return result.stdout
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                while not idle.empty():
+                    idle.get().close()
+            self._idle = {}
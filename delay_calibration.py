@@ -0,0 +1,85 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+class DelayCalibrator:
+    """Rolling per-step readiness timings used to replace hand-tuned delays."""
+
+    def __init__(self, path: Optional[str] = None, window: int = 50, percentile: float = 95,
+                 margin: float = 0.1, min_samples: int = 5):
+        self.path = os.path.expanduser(path) if path else None
+        self.window = window
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.samples: Dict[str, Deque[float]] = {}
+        # Seconds of fixed delay saved per step since the timings file was created
+        self.savings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(action_id: str, step_index: int) -> str:
+        return f"{action_id}#{step_index}"
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(key, deque(maxlen=self.window)).append(round(seconds, 4))
+        self.save()
+
+    def learned(self, key: str) -> Optional[float]:
+        """High percentile of observed readiness plus the safety margin, once there is enough data."""
+        with self._lock:
+            samples = sorted(self.samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(self.percentile / 100 * len(samples)))
+        return samples[min(rank, len(samples)) - 1] + self.margin
+
+    def record_saving(self, key: str, seconds: float):
+        with self._lock:
+            self.savings[key] = self.savings.get(key, 0.0) + seconds
+        self.save()
+
+    def report(self) -> List[str]:
+        lines = []
+        with self._lock:
+            keys = sorted(self.samples)
+        for key in keys:
+            learned = self.learned(key)
+            learned_text = f"{learned:.2f}s" if learned is not None else "not enough samples"
+            lines.append(f"{key}: {len(self.samples[key])} samples, learned delay {learned_text}, "
+                         f"saved {self.savings.get(key, 0.0):.2f}s in total")
+        return lines
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.samples = {key: deque(values, maxlen=self.window)
+                            for key, values in data.get("samples", {}).items()}
+            self.savings = data.get("savings", {})
+        except Exception as e:
+            print(f"Error loading step timings: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"samples": {key: list(values) for key, values in self.samples.items()},
+                    "savings": dict(self.savings)}
+        try:
+            # Write to a temporary file first so a crash never leaves half a file behind
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving step timings: {e}")
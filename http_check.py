@@ -0,0 +1,122 @@
+"""Check the pooled HTTP client against a local stand-in server.
+
+Starts an `http.server` on 127.0.0.1 that mimics a chat completion endpoint
+(plain JSON and server-sent events) plus a few broken replies, then verifies
+that requests reuse one keep-alive connection, that JSON path extraction and
+SSE streaming work, and that broken replies surface as HttpError.
+
+    python http_check.py
+
+Needs nothing beyond the standard library and exits non-zero on failure.
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Set
+
+from http_client import HttpError, HttpPool, extract_json_path
+
+SSE_EVENTS = [{"choices": [{"delta": {"content": text}}]} for text in ("Xin ", "chào", " 👋")]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports: Set[int] = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.client_ports.add(self.client_address[1])
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/v1/chat/completions":
+            content = f"echo: {request['messages'][0]['content']}"
+            reply = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+            self._send(200, "application/json", json.dumps(reply).encode())
+        elif self.path in ("/v1/stream", "/v1/stream-chunked"):
+            lines = [f"data: {json.dumps(event)}\n\n" for event in SSE_EVENTS] + ["data: [DONE]\n\n"]
+            if self.path == "/v1/stream":
+                self._send(200, "text/event-stream", "".join(lines).encode())
+                return
+            # One chunk per event, the way streaming APIs usually reply
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line in lines:
+                data = line.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def do_GET(self):
+        self.client_ports.add(self.client_address[1])
+        if self.path == "/truncated":
+            # Promise more body than is sent, then hang up
+            self.send_response(200)
+            self.send_header("Content-Length", "100")
+            self.end_headers()
+            self.wfile.write(b"partial")
+            self.close_connection = True
+        elif self.path == "/garbage":
+            self.wfile.write(b"NOT HTTP AT ALL\r\n\r\n")
+            self.close_connection = True
+        else:
+            self._send(200, "text/plain", b"ok")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    pool = HttpPool()
+    failures: List[str] = []
+
+    def check(name: str, passed: bool, detail=""):
+        print(f"{'ok  ' if passed else 'FAIL'} {name} {detail}".rstrip())
+        if not passed:
+            failures.append(name)
+
+    try:
+        body = json.dumps({"messages": [{"role": "user", "content": "hello"}]}).encode()
+        headers = {"Content-Type": "application/json"}
+        replies = [pool.request("POST", f"{base}/v1/chat/completions", headers, body) for _ in range(5)]
+        contents = [extract_json_path(reply.json(), "$.choices[0].message.content") for reply in replies]
+        check("json extraction", contents == ["echo: hello"] * 5, repr(contents[0]))
+        check("keep-alive reuse", len(StandInHandler.client_ports) == 1,
+              f"({len(StandInHandler.client_ports)} connection(s) for 5 requests)")
+
+        for path in ("/v1/stream", "/v1/stream-chunked"):
+            pieces = list(pool.stream("POST", f"{base}{path}", headers, body, extract="choices.0.delta.content"))
+            check(f"sse streaming {path}", pieces == ["Xin ", "chào", " 👋"], repr(pieces))
+        check("reuse after stream", pool.request("GET", f"{base}/").text() == "ok"
+              and len(StandInHandler.client_ports) == 1)
+
+        for path in ("/truncated", "/garbage"):
+            try:
+                pool.request("GET", f"{base}{path}")
+                check(f"error on {path}", False, "no error raised")
+            except HttpError as e:
+                check(f"error on {path}", True, f"({e})")
+            except Exception as e:
+                check(f"error on {path}", False, f"raised {type(e).__name__}: {e}")
+    finally:
+        pool.close()
+        server.shutdown()
+
+    if failures:
+        sys.exit(f"{len(failures)} check(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import codecs
+import http.client
+import json
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def extract_json_path(data, path: str):
+    """Look up a path like `choices.0.message.content` or `$.choices[0].message.content`."""
+    if not path or path == "$":
+        return data
+    for name, index in re.findall(r"\.?([^.\[\]]+)|\[(\d+)\]", path.lstrip("$")):
+        key = index or name
+        if isinstance(data, list):
+            data = data[int(key)]
+        elif isinstance(data, dict):
+            data = data[key]
+        else:
+            raise HttpError(f"Cannot follow {path!r} into {type(data).__name__}")
+    return data
+
+
+class HttpPool:
+    """Keep-alive connections grouped by (scheme, host, port)."""
+
+    RETRYABLE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError,
+                        BrokenPipeError, http.client.CannotSendRequest)
+
+    def __init__(self, max_per_host: int = 4, timeout: float = 30.0):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, key) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        return conn, False
+
+    def _checkin(self, key, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _open(self, method: str, url: str, headers: Optional[Dict[str, str]],
+              body: Optional[bytes], timeout: Optional[float]):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise HttpError(f"Unsupported URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # A pooled connection may have been closed by the server while idle,
+        # so retry once on a fresh connection before giving up
+        while True:
+            conn, reused = self._checkout(key)
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                return key, conn, conn.getresponse()
+            except self.RETRYABLE_ERRORS as e:
+                conn.close()
+                if not reused:
+                    raise HttpError(f"{method} {url} failed: {e}")
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                # Also covers malformed replies such as BadStatusLine or LineTooLong, and
+                # header values or URLs that http.client refuses to send (ValueError)
+                conn.close()
+                raise HttpError(f"{method} {url} failed: {e}")
+
+    def _finish(self, key, conn, response: http.client.HTTPResponse):
+        # Iterating lines stops at the end of the body without marking the response
+        # closed, and http.client refuses the next request until it is
+        if not response.isclosed():
+            response.read()
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                body: Optional[bytes] = None, timeout: Optional[float] = None) -> HttpResponse:
+        key, conn, response = self._open(method, url, headers, body, timeout)
+        try:
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # IncompleteRead when the server closes mid-body
+            conn.close()
+            raise HttpError(f"{method} {url} failed: {e}")
+        self._finish(key, conn, response)
+        return HttpResponse(response.status, dict(response.getheaders()), data)
+
+    def stream(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+               body: Optional[bytes] = None, timeout: Optional[float] = None,
+               extract: Optional[str] = None) -> Iterator[str]:
+        """Yield response text as it arrives.
+
+        Server-sent events yield the `data:` payload of each event (or the value at
+        `extract` when the payload is JSON); any other body yields raw chunks.
+        """
+        key, conn, response = self._open(method, url, headers, body, timeout)
+        completed = False
+        try:
+            if response.status >= 400:
+                raise HttpError(f"{method} {url} returned HTTP {response.status}: "
+                                f"{response.read().decode('utf-8', errors='replace')[:200]}")
+            if "text/event-stream" in (response.getheader("Content-Type") or ""):
+                for line in response:
+                    line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        continue
+                    if extract:
+                        try:
+                            payload = extract_json_path(json.loads(payload), extract)
+                        except (ValueError, KeyError, IndexError, HttpError):
+                            continue
+                    if payload:
+                        yield str(payload)
+            else:
+                # Incremental decoding keeps multi-byte characters split across chunks intact
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                while True:
+                    chunk = response.read1(8192)
+                    text = decoder.decode(chunk, final=not chunk)
+                    if text:
+                        yield text
+                    if not chunk:
+                        break
+            completed = True
+        except (OSError, http.client.HTTPException) as e:
+            raise HttpError(f"{method} {url} failed: {e}")
+        finally:
+            # Only a fully drained response leaves the connection reusable
+            if completed:
+                self._finish(key, conn, response)
+            else:
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle = {}
@@ -0,0 +1,158 @@
+import platform
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from pynput.keyboard import Key, KeyCode
+
+MODIFIER_NAMES = {
+    Key.ctrl: "ctrl", Key.ctrl_l: "ctrl", Key.ctrl_r: "ctrl",
+    Key.cmd: "cmd", Key.cmd_l: "cmd", Key.cmd_r: "cmd",
+    Key.alt: "alt", Key.alt_l: "alt", Key.alt_r: "alt",
+    Key.shift: "shift", Key.shift_l: "shift", Key.shift_r: "shift",
+}
+
+
+def _keymap_checker() -> Optional[Callable[[Iterable[int]], Set[int]]]:
+    """Return a function that tells which virtual key codes are physically down, if the platform allows it."""
+    system = platform.system()
+    try:
+        if system == "Linux":
+            from Xlib import display as xdisplay
+            connection = xdisplay.Display()
+
+            def down_keys(vks):
+                # One XQueryKeymap round trip covers every key; pynput's Linux vk is the keysym
+                keymap = connection.query_keymap()
+                down = set()
+                for vk in vks:
+                    keycode = connection.keysym_to_keycode(vk)
+                    if keycode and keymap[keycode // 8] & (1 << (keycode % 8)):
+                        down.add(vk)
+                return down
+            return down_keys
+        if system == "Windows":
+            import ctypes
+            get_async_key_state = ctypes.windll.user32.GetAsyncKeyState
+            return lambda vks: {vk for vk in vks if get_async_key_state(vk) & 0x8000}
+        if system == "Darwin":
+            import Quartz
+            state = Quartz.kCGEventSourceStateHIDSystemState
+            return lambda vks: {vk for vk in vks if Quartz.CGEventSourceKeyState(state, vk)}
+    except Exception as e:
+        print(f"Keyboard state queries are not available: {e}")
+    return None
+
+
+class KeyStateTracker:
+    """Keys currently held, keyed by virtual key code so presses and releases always pair up.
+
+    A background timer periodically compares the tracked keys with the real
+    keyboard state and drops keys whose release was never seen.
+    """
+
+    def __init__(self, reconcile_interval: float = 1.0, on_reconciled: Optional[Callable[[], None]] = None):
+        self.reconcile_interval = reconcile_interval
+        self.on_reconciled = on_reconciled
+        # identity -> (normalized name, virtual key code)
+        self._pressed: Dict[tuple, Tuple[str, Optional[int]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._down_keys = None
+        self.corrections = 0
+        self.unmatched_releases = 0
+        self.reconciliations = 0
+
+    @staticmethod
+    def describe(key) -> Optional[Tuple[tuple, str, Optional[int]]]:
+        if isinstance(key, Key):
+            vk = getattr(key.value, "vk", None)
+            name = MODIFIER_NAMES.get(key, key.name)
+            return ("key", key.name), name, vk
+        if isinstance(key, KeyCode):
+            name = key.char.lower() if key.char else None
+            if key.vk is not None:
+                return ("vk", key.vk), name or f"vk{key.vk}", key.vk
+            if name:
+                return ("char", name), name, None
+        return None
+
+    def press(self, key):
+        described = self.describe(key)
+        if described is None:
+            return
+        identity, name, vk = described
+        with self._lock:
+            self._pressed[identity] = (name, vk)
+
+    def release(self, key):
+        described = self.describe(key)
+        if described is None:
+            return
+        identity, name, _ = described
+        with self._lock:
+            if self._pressed.pop(identity, None) is not None:
+                return
+            # The same physical key can report a different code on release
+            # (e.g. "T" pressed with shift, "t" released without it), so fall back to the name
+            for other, (other_name, _) in list(self._pressed.items()):
+                if other_name == name and name not in MODIFIER_NAMES.values():
+                    del self._pressed[other]
+                    return
+            self.unmatched_releases += 1
+
+    def names(self) -> Set[str]:
+        with self._lock:
+            return {name for name, _ in self._pressed.values()}
+
+    def modifiers(self) -> Set[str]:
+        return self.names() & set(MODIFIER_NAMES.values())
+
+    def regular_keys(self) -> Set[str]:
+        return self.names() - set(MODIFIER_NAMES.values())
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self._pressed
+
+    def reconcile(self) -> int:
+        """Drop tracked keys that are no longer physically down and return how many were dropped."""
+        with self._lock:
+            tracked = {identity: vk for identity, (_, vk) in self._pressed.items() if vk is not None}
+        if not tracked or self._down_keys is None:
+            return 0
+        down = self._down_keys(tracked.values())
+        stale = [identity for identity, vk in tracked.items() if vk not in down]
+        with self._lock:
+            self.reconciliations += 1
+            for identity in stale:
+                if self._pressed.pop(identity, None) is not None:
+                    self.corrections += 1
+        if stale:
+            print(f"Cleared {len(stale)} stuck key(s)")
+            if self.on_reconciled:
+                self.on_reconciled()
+        return len(stale)
+
+    def start(self):
+        self._down_keys = _keymap_checker()
+        if self._down_keys is None:
+            return
+        self._thread = threading.Thread(target=self._run, name="key-state-reconciler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_interval):
+            if self.is_empty():
+                continue
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Error reconciling key state: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> str:
+        return (f"corrections={self.corrections} unmatched_releases={self.unmatched_releases} "
+                f"reconciliations={self.reconciliations}")
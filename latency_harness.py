@@ -0,0 +1,246 @@
+"""End-to-end hotkey latency harness.
+
+Starts a private Xvfb display, a minimal Tk window that timestamps every key
+press it receives, and the `main.py` daemon. For each template in
+template_actions.json it fires the template's hotkey through XTest and reports
+how long it took until the first and the last injected key press landed in the
+target window.
+
+    python latency_harness.py --runs 20
+
+Requires Xvfb, python-xlib (installed with pynput on Linux) and xclip or xsel
+for the clipboard steps. Linux only. Timestamps use CLOCK_MONOTONIC, which is
+shared by all processes on the machine.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Keysyms used to press the modifiers of a shortcut like "ctrl+shift+t"
+MODIFIER_KEYSYMS = {"ctrl": "Control_L", "shift": "Shift_L", "alt": "Alt_L", "cmd": "Super_L"}
+
+
+def run_target():
+    """The window under test: print one JSON line per key press with its arrival time."""
+    import tkinter
+
+    root = tkinter.Tk()
+    root.title("Smart Actions latency target")
+    root.geometry("600x300+0+0")
+    text = tkinter.Text(root)
+    text.pack(fill="both", expand=True)
+
+    def on_key(event):
+        print(json.dumps({"t": time.monotonic(), "keysym": event.keysym, "state": event.state}), flush=True)
+
+    text.bind("<KeyPress>", on_key)
+
+    def on_command(_):
+        # The harness asks for a clean text box between runs
+        line = sys.stdin.readline().strip()
+        if line == "clear":
+            text.delete("1.0", "end")
+        text.focus_force()
+
+    root.createfilehandler(sys.stdin, tkinter.READABLE, on_command)
+    root.after(100, lambda: (root.focus_force(), text.focus_force(),
+                             print(json.dumps({"ready": True}), flush=True)))
+    root.mainloop()
+
+
+class LineReader:
+    """Collect stdout lines of a child process on a background thread."""
+
+    def __init__(self, process: subprocess.Popen):
+        self.lines: "queue.Queue[str]" = queue.Queue()
+        threading.Thread(target=self._pump, args=(process.stdout,), daemon=True).start()
+
+    def _pump(self, stream):
+        for line in stream:
+            self.lines.put(line)
+
+    def wait_for(self, predicate, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                line = self.lines.get(timeout=deadline - time.monotonic())
+            except queue.Empty:
+                break
+            if predicate(line):
+                return line
+        return None
+
+
+def start_xvfb(display: str) -> subprocess.Popen:
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x720x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket_path = f"/tmp/.X11-unix/X{display.lstrip(':')}"
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError(f"Xvfb did not start on {display}")
+        time.sleep(0.05)
+    return process
+
+
+def press_hotkey(display, shortcut: str):
+    """Press and release a shortcut through XTest in a single batch."""
+    from Xlib import X, XK
+    from Xlib.ext import xtest
+
+    keycodes = []
+    for part in shortcut.lower().split("+"):
+        keysym = XK.string_to_keysym(MODIFIER_KEYSYMS.get(part, part))
+        keycodes.append(display.keysym_to_keycode(keysym))
+    for keycode in keycodes:
+        xtest.fake_input(display, X.KeyPress, keycode)
+    for keycode in reversed(keycodes):
+        xtest.fake_input(display, X.KeyRelease, keycode)
+    display.sync()
+
+
+def collect_events(reader: LineReader, settle: float, timeout: float) -> List[dict]:
+    """Gather key presses until none arrived for `settle` seconds."""
+    events = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = reader.wait_for(lambda _: True, settle)
+        if line is None:
+            break
+        events.append(json.loads(line))
+    return events
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": round(ordered[0], 1),
+        "p50": round(statistics.median(ordered), 1),
+        # Nearest-rank percentile
+        "p90": round(ordered[math.ceil(0.9 * len(ordered)) - 1], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def measure_template(template: dict, runs: int, settle: float, env: dict, display) -> dict:
+    shortcut = template["shortcut"]
+    hotkey_presses = len(shortcut.split("+"))
+
+    # Each template runs against its own daemon with only that action configured
+    workdir = tempfile.mkdtemp(prefix="smart_actions_latency_")
+    with open(os.path.join(workdir, "smart_actions.json"), "w") as f:
+        json.dump({"actions": [template]}, f)
+
+    target = subprocess.Popen([sys.executable, __file__, "--target"], env=env, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    target_reader = LineReader(target)
+    if target_reader.wait_for(lambda line: '"ready"' in line, 10) is None:
+        raise RuntimeError("Target window did not start")
+
+    daemon = subprocess.Popen([sys.executable, "-u", os.path.join(HERE, "main.py")], cwd=workdir, env=env,
+                              text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    daemon_reader = LineReader(daemon)
+    first, last = [], []
+    try:
+        if daemon_reader.wait_for(lambda line: "Smart Actions is running" in line, 15) is None:
+            raise RuntimeError("Daemon did not start")
+        time.sleep(0.5)  # Let the listener attach to the display
+
+        for _ in range(runs):
+            target.stdin.write("clear\n")
+            target.stdin.flush()
+            time.sleep(0.2)
+            triggered_at = time.monotonic()
+            press_hotkey(display, shortcut)
+            events = collect_events(target_reader, settle, timeout=30)
+            # The hotkey's own presses reach the target first; everything after is injected
+            injected = events[hotkey_presses:]
+            if injected:
+                first.append((injected[0]["t"] - triggered_at) * 1000)
+                last.append((injected[-1]["t"] - triggered_at) * 1000)
+            time.sleep(0.3)
+    finally:
+        for process in (daemon, target):
+            process.terminate()
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "template": template["name"],
+        "shortcut": shortcut,
+        "missed": runs - len(first),
+        "first_event_ms": summarize(first),
+        "last_event_ms": summarize(last),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure hotkey-to-injection latency under Xvfb")
+    parser.add_argument("--runs", type=int, default=10, help="hotkey presses per template")
+    parser.add_argument("--display", default=":99", help="Xvfb display to start")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="seconds without input after which an action is considered finished")
+    parser.add_argument("--templates", default=os.path.join(HERE, "template_actions.json"))
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--target", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.target:
+        run_target()
+        return
+
+    if not shutil.which("Xvfb"):
+        sys.exit("Xvfb is required to run the latency harness")
+    if not (shutil.which("xclip") or shutil.which("xsel")):
+        print("Warning: xclip/xsel not found, clipboard steps will fail", file=sys.stderr)
+
+    from Xlib import display as xdisplay
+
+    with open(args.templates, "r") as f:
+        templates = json.load(f).get("actions", [])
+
+    xvfb = start_xvfb(args.display)
+    env = dict(os.environ, DISPLAY=args.display)
+    results = []
+    try:
+        display = xdisplay.Display(args.display)
+        for template in templates:
+            print(f"Measuring {template['name']} ({template['shortcut']})...", file=sys.stderr)
+            results.append(measure_template(template, args.runs, args.settle, env, display))
+        display.close()
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['template']} [{result['shortcut']}] missed={result['missed']}")
+        for label in ("first_event_ms", "last_event_ms"):
+            stats = result[label]
+            if stats:
+                print(f"  {label:<15} n={stats['n']} min={stats['min']} p50={stats['p50']} "
+                      f"p90={stats['p90']} max={stats['max']}")
+
+
+if __name__ == "__main__":
+    main()
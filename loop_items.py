@@ -0,0 +1,39 @@
+from typing import Iterator
+
+
+def iter_text_items(text: str, separator: str = "\n") -> Iterator[str]:
+    """Yield the pieces of `text` one at a time without building a list of all of them."""
+    if not separator:
+        raise ValueError("Separator must not be empty")
+    start = 0
+    while True:
+        end = text.find(separator, start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end]
+        start = end + len(separator)
+
+
+def iter_file_items(path: str, separator: str = "\n", chunk_size: int = 65536) -> Iterator[str]:
+    """Yield the pieces of a file while only holding one chunk plus a partial item in memory."""
+    if not separator:
+        raise ValueError("Separator must not be empty")
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        pending = ""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            pending += chunk
+            start = 0
+            while True:
+                end = pending.find(separator, start)
+                if end == -1:
+                    break
+                yield pending[start:end]
+                start = end + len(separator)
+            pending = pending[start:]
+        if pending:
+            yield pending
@@ -1,19 +1,83 @@
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+import re
 import subprocess
+import sys
+import threading
 import platform
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 import time
-from pynput import keyboard
-from pynput.keyboard import Key, KeyCode
+from urllib.parse import quote
+from command_runner import CommandError, WorkerPool, quote_value
+from http_client import HttpError, HttpPool, extract_json_path
+from result_cache import ResultCache, cache_key
+from delay_calibration import DelayCalibrator
+from text_triggers import AbbreviationMatcher
+from loop_items import iter_file_items, iter_text_items
+from clipboard_history import ClipboardHistory, watch_clipboard
+from scheduler import Scheduler, parse_trigger
+
+class ActionAborted(Exception):
+    pass
+
 
 class SmartActionManager:
+    # Pause after an app is detected, used until a learned delay is available
+    APP_SETTLE_TIME = {"Darwin": 0.5, "Windows": 1.0}
+
     def __init__(self):
         self.actions: Dict[str, List[dict]] = {}
-        self.current_keys = set()
+        self.named_actions: Dict[str, dict] = {}
+        self.abbreviations: Dict[str, dict] = {}
+        self.schedules: List[tuple] = []
+        self.settings: dict = {}
+        # pynput needs a display on Linux, so it is only loaded once keys are listened to or sent
+        self.key_state = None
+        self.command_pool = WorkerPool()
+        self.http_pool = HttpPool()
         self.load_actions()
+        cache_settings = self.settings.get("cache", {})
+        self.result_cache = ResultCache(
+            max_entries=cache_settings.get("max_entries", 256),
+            ttl=cache_settings.get("ttl", 3600),
+            path=cache_settings.get("path"))
+        delay_settings = self.settings.get("adaptive_delays", {})
+        self.adaptive_delays = delay_settings.get("enabled", False)
+        self.delay_calibrator = DelayCalibrator(
+            path=delay_settings.get("path", "smart_actions_timings.json"),
+            percentile=delay_settings.get("percentile", 95),
+            margin=delay_settings.get("margin", 0.1),
+            min_samples=delay_settings.get("min_samples", 5))
+        history_settings = self.settings.get("clipboard_history", {})
+        self.clipboard_history = None
+        self._last_written_clipboard = None
+        if history_settings.get("enabled", False):
+            unknown = set(history_settings) - {"enabled", "max_entries", "max_bytes", "max_entry_bytes",
+                                               "compress_after", "compress_min_bytes"}
+            if unknown:
+                print(f"Ignoring unknown clipboard_history settings: {', '.join(sorted(unknown))}")
+            try:
+                self.clipboard_history = ClipboardHistory(
+                    max_entries=int(history_settings.get("max_entries", 50)),
+                    max_bytes=int(history_settings.get("max_bytes", 1024 * 1024)),
+                    max_entry_bytes=int(history_settings.get("max_entry_bytes", 256 * 1024)),
+                    compress_after=int(history_settings.get("compress_after", 5)),
+                    compress_min_bytes=int(history_settings.get("compress_min_bytes", 1024)))
+            except (TypeError, ValueError) as e:
+                print(f"Clipboard history disabled, invalid settings: {e}")
         self.listener = None
+        self.mouse_listener = None
         self.action_executed = False
+        self.scheduler = None
+        self._schedule_executor = None
+        self._scheduled_pending = set()
+        self._scheduled_lock = threading.Lock()
+        # Hotkeys and abbreviations run on the listener thread, schedules on executor threads;
+        # only one action may inject keys or borrow the clipboard at a time
+        self._action_lock = threading.RLock()
 
     def load_actions(self):
         try:
@@ -23,29 +87,79 @@ class SmartActionManager:
                     print(config_data)
                     # Convert the JSON structure to the format expected by the application
                     self.actions = {}
+                    self.named_actions = {}
+                    self.abbreviations = {}
+                    self.schedules = []
+                    self.settings = config_data.get("settings", {})
                     for action in config_data.get("actions", []):
                         shortcut = action.get("shortcut")
                         steps = action.get("steps", [])
                         if shortcut and steps:
                             self.actions[shortcut] = steps
+                        # Actions without a shortcut can still be run from the command line
+                        if action.get("name") and steps:
+                            self.named_actions[action["name"]] = action
+                        # Typing an abbreviation such as ";sig" triggers the action too
+                        if action.get("abbreviation") and steps:
+                            self.abbreviations[action["abbreviation"]] = action
+                        # One schedule or a list of them, e.g. {"every": 60} or {"cron": "0 9 * * 1-5"}
+                        schedules = action.get("schedule", [])
+                        if not isinstance(schedules, list):
+                            schedules = [schedules]
+                        if schedules and not action.get("name"):
+                            print(f"Ignoring schedule for an action without a name: {schedules}")
+                        elif action.get("name") and steps:
+                            for schedule in schedules:
+                                try:
+                                    self.schedules.append((action["name"], parse_trigger(schedule)))
+                                except ValueError as e:
+                                    print(f"Invalid schedule for {action['name']}: {e}")
         
         except Exception as e:
             print(f"Error loading actions: {e}")
             self.actions = {}
+            self.named_actions = {}
+            self.abbreviations = {}
+            self.schedules = []
+
+        self.abbreviation_matcher = AbbreviationMatcher(self.abbreviations.keys())
+
+        self._prespawn_command_workers()
+
+    def _prespawn_command_workers(self):
+        # Start workers up front so the first run_command does not pay process startup
+        if not WorkerPool.supported():
+            return
+        # Shortcut actions are stored as step lists; named and abbreviation actions as dicts
+        step_lists = list(self.actions.values())
+        step_lists += [action["steps"] for action in self.named_actions.values()]
+        step_lists += [action["steps"] for action in self.abbreviations.values()]
+        runtimes = {step.get("runtime", "sh")
+                    for steps in step_lists
+                    for step in self._iter_steps(steps)
+                    if step.get("type") == "run_command"}
+        for runtime in runtimes:
+            try:
+                self.command_pool.prespawn(runtime)
+            except Exception as e:
+                print(f"Error starting {runtime} command workers: {e}")
 
     def on_press(self, key):
         try:
+            # Track every press, even while an action runs, so its release pairs up
+            self.key_state.press(key)
+
+            self._feed_abbreviation(key)
+
             if self.action_executed:
                 return
 
-            # Normalize the key before adding to set
-            if isinstance(key, KeyCode):
-                self.current_keys.add(key.char.lower())
-            else:
-                self.current_keys.add(key)
-
-            print(f"Current keys held: {self.current_keys}")
+            print(f"Current keys held: {self.key_state.names()}")
             
+            # Get currently pressed modifiers and regular keys
+            current_modifiers = self.key_state.modifiers()
+            current_regular_keys = self.key_state.regular_keys()
+
             # Check for any registered key combinations
             for key_combo in self.actions.keys():
                 # Split and normalize the key combination
@@ -54,25 +168,6 @@ class SmartActionManager:
                 # Check modifiers and regular keys separately
                 modifiers_required = set(part for part in parts if part in {'ctrl', 'cmd', 'alt', 'shift'})
                 regular_keys_required = set(part for part in parts if part not in {'ctrl', 'cmd', 'alt', 'shift'})
-                
-                # Get currently pressed modifiers
-                current_modifiers = set()
-                if Key.ctrl_l in self.current_keys or Key.ctrl_r in self.current_keys:
-                    current_modifiers.add('ctrl')
-                if Key.cmd_l in self.current_keys or Key.cmd_r in self.current_keys:
-                    current_modifiers.add('cmd')
-                if Key.alt_l in self.current_keys or Key.alt_r in self.current_keys:
-                    current_modifiers.add('alt')
-                if Key.shift_l in self.current_keys or Key.shift_r in self.current_keys:
-                    current_modifiers.add('shift')
-                
-                # Get currently pressed regular keys
-                current_regular_keys = {k.char.lower() if isinstance(k, KeyCode) else k 
-                                     for k in self.current_keys 
-                                     if isinstance(k, KeyCode) or k not in {Key.ctrl_l, Key.ctrl_r, 
-                                                                          Key.cmd_l, Key.cmd_r,
-                                                                          Key.alt_l, Key.alt_r,
-                                                                          Key.shift_l, Key.shift_r}}
 
                 # Check if both modifiers and regular keys match exactly
                 if (modifiers_required == current_modifiers and 
@@ -87,45 +182,156 @@ class SmartActionManager:
 
     def on_release(self, key):
         try:
-            if hasattr(key, 'char'):
-                self.current_keys.discard(key.char)
-            else:
-                self.current_keys.discard(key)
+            self.key_state.release(key)
             
-            if not self.current_keys:
+            if self.key_state.is_empty():
                 self.action_executed = False
         except Exception as e:
             print(f"Error in on_release: {e}")
 
+    def _on_key_state_reconciled(self):
+        # Stuck keys were cleared, so the last shortcut is no longer being held
+        if self.key_state.is_empty():
+            self.action_executed = False
+
+    def _feed_abbreviation(self, key):
+        if not self.abbreviations:
+            return
+
+        from pynput import keyboard
+        from pynput.keyboard import Key, KeyCode
+        matcher = self.abbreviation_matcher
+        if isinstance(key, KeyCode) and key.char:
+            if self.key_state.modifiers() - {"shift"}:
+                matcher.reset()
+                return
+            abbreviation = matcher.feed(key.char)
+        elif key == Key.space:
+            abbreviation = matcher.feed(" ")
+        elif key == Key.backspace:
+            matcher.backspace()
+            return
+        elif key in (Key.shift, Key.shift_l, Key.shift_r) or isinstance(key, KeyCode):
+            # Shift is part of typing; dead keys produce no character yet
+            return
+        else:
+            # Navigation, enter, tab, escape and modifiers move the caret or focus
+            matcher.reset()
+            return
+
+        if abbreviation is None:
+            return
+        matcher.reset()
+        print(f"Detected abbreviation {abbreviation}")
+
+        action = self.abbreviations[abbreviation]
+        with self._action_lock:
+            # Erase the typed abbreviation before running the action
+            kb = keyboard.Controller()
+            for _ in range(len(abbreviation)):
+                kb.press(Key.backspace)
+                kb.release(Key.backspace)
+            # Same timing key as the hotkey, schedule and command line runs of this action
+            self._run_triggered(action["steps"], action.get("shortcut") or action.get("name") or abbreviation)
+
+    def on_click(self, x, y, button, pressed):
+        # A click usually moves the caret or focuses another window
+        if pressed:
+            self.abbreviation_matcher.reset()
+
     def start_listening(self):
+        from pynput import keyboard, mouse
+        from key_state import KeyStateTracker
+        self.key_state = KeyStateTracker(on_reconciled=self._on_key_state_reconciled)
         self.listener = keyboard.Listener(
             on_press=self.on_press,
             on_release=self.on_release)
         self.listener.start()
+        self.key_state.start()
+        if self.abbreviations:
+            self.mouse_listener = mouse.Listener(on_click=self.on_click)
+            self.mouse_listener.start()
+        if self.clipboard_history is not None and not watch_clipboard(self._on_clipboard_change):
+            print("Clipboard history only records text seen by Smart Actions on this platform")
+        self.start_scheduler()
+
+    def start_scheduler(self):
+        if not self.schedules:
+            return
+        # Scheduled actions run off the scheduler thread, so a slow action never
+        # delays the deadlines of the others
+        self._schedule_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduled-action")
+        self.scheduler = Scheduler(self._dispatch_scheduled)
+        for name, trigger in self.schedules:
+            self.scheduler.add(name, trigger)
+        self.scheduler.start()
+        print(f"Scheduled {len(self.scheduler)} run(s)")
+
+    def _dispatch_scheduled(self, name: str):
+        with self._scheduled_lock:
+            # Skip a run if the previous one for this action has not finished yet
+            if name in self._scheduled_pending:
+                print(f"Skipping scheduled run of {name}, previous run still in progress")
+                return
+            self._scheduled_pending.add(name)
+        self._schedule_executor.submit(self._run_scheduled, name)
+
+    def _run_scheduled(self, name: str):
+        try:
+            action = self.named_actions[name]
+            print(f"Running scheduled action {name}")
+            self._run_triggered(action["steps"], action.get("shortcut") or name)
+        except Exception as e:
+            print(f"Error in scheduled action {name}: {e}")
+        finally:
+            with self._scheduled_lock:
+                self._scheduled_pending.discard(name)
 
     def execute_action(self, key_combo: str):
         if key_combo not in self.actions:
             return
-        
-        for action in self.actions[key_combo]:
+
+        self._run_triggered(self.actions[key_combo], key_combo)
+
+    def _run_triggered(self, steps: List[dict], action_id: str):
+        # Shared by hotkeys, abbreviations and schedules
+        with self._action_lock:
+            try:
+                self.run_steps(steps, {}, action_id=action_id)
+            except (CommandError, HttpError, ActionAborted) as e:
+                print(f"Action {action_id} aborted: {e}")
+
+    def _iter_steps(self, steps: List[dict]):
+        # Walk steps including the blocks nested in repeat/foreach
+        for step in steps:
+            yield step
+            yield from self._iter_steps(step.get("steps", []))
+
+    def run_action(self, name: str, variables: Dict[str, str]) -> Dict[str, str]:
+        """Run an action by name without a hotkey and return its variables."""
+        action = self.named_actions.get(name)
+        if action is None:
+            raise ValueError(f"No action named {name!r}")
+        self.run_steps(action["steps"], variables, action_id=action.get("shortcut") or name)
+        return variables
+
+    def run_steps(self, steps: List[dict], variables: Dict[str, str], action_id: str = ""):
+        skip_delays = False
+        for index, action in enumerate(steps):
             action_type = action.get("type")
             value = action.get("value")
             
             # We no longer need to check for delay here since we have a dedicated delay action type
             # The delay field is kept for backward compatibility but not used
 
+            # Fixed delays right after open_app are covered by the learned delay
+            if action_type == "delay" and skip_delays:
+                print(f"Skipping fixed delay of {value} seconds, learned delay already applied")
+                continue
+            skip_delays = False
+
             if action_type == "open_app":
-                if platform.system() == "Darwin":  # macOS
-                    # Simple open command that either opens the app or brings it to front
-                    subprocess.run(["open", "-a", value])
-                    # Wait for the app to fully launch
-                    app_name = value.split("/")[-1].split(".app")[0] if ".app" in value else value
-                    self._wait_for_app_launch(app_name)
-                elif platform.system() == "Windows":
-                    # For Windows, you might want to add similar logic using tasklist
-                    process = subprocess.Popen([value])
-                    # Wait for the process to initialize
-                    self._wait_for_process(process.pid)
+                skip_delays = self._open_app_step(value, steps, index, action_id)
             elif action_type == "open_url":
                 # Open URL in default web browser
                 if platform.system() == "Darwin":  # macOS
@@ -146,16 +352,20 @@ class SmartActionManager:
                 except ValueError:
                     print(f"Invalid delay value: {value}")
             elif action_type == "keyboard":
+                from pynput import keyboard
+                from pynput.keyboard import Key
                 kb = keyboard.Controller()
                 keyboard_input_type = action.get("keyboard_input_type", "text")  # Default to text for backward compatibility
-                value = action.get("value", "")
+                value = self._render(action.get("value", ""), variables)
                 
                 if keyboard_input_type == "text":
                     # Use clipboard for instant text input instead of typing
                     import pyperclip
                     # Save current clipboard content
                     previous_clipboard = pyperclip.paste()
+                    self._remember_clipboard(previous_clipboard)
                     # Copy new text to clipboard
+                    self._last_written_clipboard = value
                     pyperclip.copy(value)
                     # Paste the text
                     if platform.system() == "Darwin":  # macOS
@@ -256,7 +466,7 @@ class SmartActionManager:
                             kb.type(value)
             elif action_type == "clipboard":
                 clipboard_action = action.get("clipboard_action", "copy")
-                value = action.get("value", "")
+                value = self._render(action.get("value", ""), variables)
                 
                 if clipboard_action == "copy":
                     # Copy the provided text to clipboard
@@ -265,98 +475,536 @@ class SmartActionManager:
                     if value:
                         # If value is provided, copy it directly
                         pyperclip.copy(value)
+                        self._remember_clipboard(value)
                         print(f"Copied to clipboard: {value}")
                     else:
                         # If no value is provided, try to copy currently selected text
-                        kb = keyboard.Controller()
-                        
-                        # Simulate Ctrl+C or Cmd+C to copy selected text
-                        if platform.system() == "Darwin":  # macOS
-                            with kb.pressed(Key.cmd):
-                                kb.press('c')
-                                kb.release('c')
-                                print("Copied to clipboard")
-                        else:  # Windows/Linux
-                            with kb.pressed(Key.ctrl):
-                                kb.press('c')
-                                kb.release('c')
-                        
-                        # Give a small delay for the copy operation to complete
-                        time.sleep(0.1)
+                        self._copy_selection()
                         print("Copied selected text to clipboard")
                         
                 elif clipboard_action == "paste":
                     # Paste from clipboard
-                    kb = keyboard.Controller()
-                    if platform.system() == "Darwin":  # macOS
-                        with kb.pressed(Key.cmd):
-                            kb.press('v')
-                            kb.release('v')
-                    else:  # Windows/Linux
-                        with kb.pressed(Key.ctrl):
-                            kb.press('v')
-                            kb.release('v')
+                    self._paste_clipboard()
+                elif clipboard_action == "paste_history":
+                    # Paste an earlier clipboard entry, by number (1 = most recent) or by search
+                    import pyperclip
+                    text = self._find_history_entry(value, action.get("match", "substring"))
+                    if text is None:
+                        print(f"No clipboard history entry matches {value!r}")
+                    else:
+                        pyperclip.copy(text)
+                        self._paste_clipboard()
+            elif action_type == "run_command":
+                # Run a command with the selection/clipboard on stdin and keep its stdout
+                input_text = self._read_step_input(action.get("input", "clipboard"), variables)
+                runtime = action.get("runtime", "sh")
+                # Values are quoted so text from the selection, a response or a file cannot run as code
+                command = self._render(value, variables, quote=lambda text: quote_value(text, runtime))
+                output, _ = self._cached(
+                    action,
+                    ("run_command", runtime, command, input_text),
+                    lambda: self.command_pool.run(
+                        command,
+                        input_text,
+                        timeout=float(action.get("timeout", 10)),
+                        runtime=runtime))
+                output_name = action.get("output", "output")
+                variables[output_name] = output.rstrip("\n")
+                print(f"Command finished, output stored as {output_name}")
+            elif action_type == "http_request":
+                self._http_request_step(action, variables)
+            elif action_type in ("wait_for_image", "wait_for_pixel"):
+                self._screen_wait_step(action)
+            elif action_type in ("repeat", "foreach"):
+                self._loop_step(action, variables, f"{action_id}#{index}")
+
+    def _open_app_step(self, value: str, steps: List[dict], index: int, action_id: str) -> bool:
+        """Open an app, recording how long it took to become ready.
 
-    def _wait_for_app_launch(self, app_name, timeout=10):
-        """Wait for an application to fully launch on macOS."""
+        Returns True when a learned delay was applied and the fixed delays that
+        follow this step should be skipped.
+        """
+        step_key = self.delay_calibrator.key(action_id, index)
+        learned = self.delay_calibrator.learned(step_key) if self.adaptive_delays else None
+        default_settle = self.APP_SETTLE_TIME.get(platform.system(), 0.5)
+        settle = 0 if learned is not None else default_settle
+
+        launched_at = time.monotonic()
+        if platform.system() == "Darwin":  # macOS
+            # Simple open command that either opens the app or brings it to front
+            subprocess.run(["open", "-a", value])
+            # Wait for the app to fully launch
+            app_name = value.split("/")[-1].split(".app")[0] if ".app" in value else value
+            ready_after = self._wait_for_app_launch(app_name, settle=settle, started_at=launched_at)
+        elif platform.system() == "Windows":
+            # For Windows, you might want to add similar logic using tasklist
+            process = subprocess.Popen([value])
+            # Wait for the process to initialize
+            ready_after = self._wait_for_process(process.pid, settle=settle, started_at=launched_at)
+        else:
+            return False
+
+        if ready_after is None:
+            return False
+        self.delay_calibrator.record(step_key, ready_after)
+
+        # What the hand-tuned config waits: readiness, the settle pause and any delay steps after it
+        fixed_wait = ready_after + default_settle
+        for step in steps[index + 1:]:
+            if step.get("type") != "delay":
+                break
+            try:
+                fixed_wait += float(step.get("value"))
+            except (TypeError, ValueError):
+                pass
+
+        if learned is None:
+            suggestion = self.delay_calibrator.learned(step_key)
+            if suggestion is not None:
+                print(f"Step {step_key}: fixed wait {fixed_wait:.2f}s, "
+                      f"learned delay would wait {max(suggestion, ready_after):.2f}s")
+            return False
+
+        remaining = learned - (time.monotonic() - launched_at)
+        if remaining > 0:
+            time.sleep(remaining)
+        used = max(learned, ready_after)
+        self.delay_calibrator.record_saving(step_key, fixed_wait - used)
+        print(f"Step {step_key}: fixed wait {fixed_wait:.2f}s -> learned {used:.2f}s "
+              f"(saved {fixed_wait - used:.2f}s)")
+        return True
+
+    def _http_request_step(self, action: dict, variables: Dict[str, str]):
+        # The step input is available to the URL, headers and body as {{input}}
+        step_variables = {**variables, "input": self._read_step_input(action.get("input", "none"), variables)}
+        method = action.get("method", "GET").upper()
+        # Values are percent-encoded so spaces, & # ? in the input cannot change the URL
+        url = self._render(action.get("value", ""), step_variables, quote=lambda text: quote(text, safe=""))
+        headers = self._render(action.get("headers", {}), step_variables)
+        body = None
+        if "body" in action:
+            body_value = self._render(action["body"], step_variables)
+            if isinstance(body_value, str):
+                body = body_value.encode()
+            else:
+                body = json.dumps(body_value).encode()
+                headers.setdefault("Content-Type", "application/json")
+        timeout = float(action.get("timeout", 30))
+        extract = action.get("extract")
+        output_name = action.get("output", "response")
+        key_parts = ("http_request", method, url, headers, body, extract)
+
+        if action.get("stream"):
+            # Type each piece as soon as it arrives instead of waiting for the full reply
+            from pynput import keyboard
+            kb = keyboard.Controller()
+
+            def stream_response():
+                received = []
+                for text in self.http_pool.stream(method, url, headers, body, timeout, extract=extract):
+                    received.append(text)
+                    kb.type(text)
+                return "".join(received)
+
+            output, hit = self._cached(action, key_parts, stream_response)
+            if hit:
+                kb.type(output)
+        else:
+            def fetch_response():
+                response = self.http_pool.request(method, url, headers, body, timeout)
+                if response.status >= 400:
+                    raise HttpError(f"{method} {url} returned HTTP {response.status}: {response.text()[:200]}")
+                if not extract:
+                    return response.text()
+                try:
+                    result = extract_json_path(response.json(), extract)
+                except (ValueError, KeyError, IndexError) as e:
+                    raise HttpError(f"Could not extract {extract} from response: {e}")
+                return result if isinstance(result, str) else json.dumps(result)
+
+            output, _ = self._cached(action, key_parts, fetch_response)
+        variables[output_name] = output
+        print(f"HTTP {method} {url} finished, output stored as {output_name}")
+
+    def _loop_step(self, action: dict, variables: Dict[str, str], loop_id: str):
+        """Run the nested "steps" once per count (repeat) or per item (foreach)."""
+        if action.get("type") == "repeat":
+            items = (str(i) for i in range(int(action.get("count", 1))))
+        else:
+            separator = action.get("separator", "\n")
+            if not separator:
+                # An empty separator would yield empty items forever
+                raise ActionAborted("foreach separator must not be empty")
+            source = action.get("source", "clipboard")
+            if source == "file":
+                items = iter_file_items(os.path.expanduser(self._render(action.get("value", ""), variables)), separator)
+            else:
+                items = iter_text_items(self._read_step_input(source, variables), separator)
+
+        item_name = action.get("as", "item")
+        interval = float(action.get("interval", 0))
+        max_items = action.get("max_items")
+        count = 0
+        previous_input = variables.get("input")
+        try:
+            with self._cancel_on_key(action.get("cancel_key", "esc")) as cancelled:
+                for item in items:
+                    if cancelled.is_set():
+                        raise ActionAborted(f"{action.get('type')} cancelled after {count} items")
+                    if action.get("type") == "foreach":
+                        if action.get("separator", "\n") == "\n":
+                            item = item.rstrip("\r")
+                        if not item and action.get("skip_empty", True):
+                            continue
+                    if max_items is not None and count >= int(max_items):
+                        break
+                    if count and interval > 0:
+                        # Waiting on the event lets the cancel key interrupt the throttle pause
+                        if cancelled.wait(interval):
+                            raise ActionAborted(f"{action.get('type')} cancelled after {count} items")
+                    variables[item_name] = item
+                    variables["index"] = str(count)
+                    if action.get("type") == "foreach":
+                        # Nested steps that read the selection/clipboard get the current item instead
+                        variables["input"] = item
+                    self.run_steps(action.get("steps", []), variables, action_id=loop_id)
+                    count += 1
+        finally:
+            if action.get("type") == "foreach":
+                if previous_input is None:
+                    variables.pop("input", None)
+                else:
+                    variables["input"] = previous_input
+        print(f"{action.get('type')} finished after {count} items")
+
+    @contextlib.contextmanager
+    def _cancel_on_key(self, key_name: Optional[str]):
+        # The main listener is busy running this action, so watch the cancel key separately
+        cancelled = threading.Event()
+        listener = None
+        # Only the daemon listens to the keyboard; command line runs are stopped with Ctrl+C
+        if key_name and self.listener is not None:
+            from pynput import keyboard
+            from pynput.keyboard import Key, KeyCode
+            cancel_key = getattr(Key, key_name, None) or KeyCode.from_char(key_name)
+
+            def on_press(key):
+                if key == cancel_key:
+                    cancelled.set()
+
+            try:
+                listener = keyboard.Listener(on_press=on_press)
+                listener.start()
+            except Exception as e:
+                print(f"Cancel key {key_name} is not available: {e}")
+                listener = None
+        try:
+            yield cancelled
+        finally:
+            if listener is not None:
+                listener.stop()
+
+    def _screen_wait_step(self, action: dict):
+        # Wait until a screen region looks ready instead of sleeping for a fixed time
+        import screen_match
+        action_type = action.get("type")
+        region = action.get("region", [0, 0])
+        timeout = float(action.get("timeout", 10))
+        tolerance = int(action.get("tolerance", 16))
+        started = time.monotonic()
+        try:
+            if action_type == "wait_for_image":
+                matched = screen_match.wait_for_image(
+                    action.get("value", ""), region[0], region[1],
+                    timeout=timeout,
+                    tolerance=tolerance,
+                    threshold=float(action.get("threshold", 0.98)),
+                    size=region[2:4] or None)
+            else:
+                matched = screen_match.wait_for_pixel(
+                    region[0], region[1], action.get("value", "#000000"),
+                    timeout=timeout,
+                    tolerance=tolerance)
+        except (OSError, ValueError) as e:
+            # A missing or unreadable reference image, a size mismatch or a failed capture
+            raise ActionAborted(f"{action_type} failed: {e}")
+
+        elapsed = time.monotonic() - started
+        if matched:
+            print(f"{action_type} matched after {elapsed:.2f} seconds")
+        elif action.get("required"):
+            raise ActionAborted(f"{action_type} did not match within {timeout} seconds")
+        else:
+            print(f"{action_type} timed out after {timeout} seconds, continuing")
+
+    def _cached(self, action: dict, key_parts: tuple, compute):
+        """Run compute(), reusing an earlier result when the step opts in with "cache"."""
+        cache_option = action.get("cache")
+        if not cache_option:
+            return compute(), False
+        ttl = cache_option.get("ttl") if isinstance(cache_option, dict) else None
+        value, hit = self.result_cache.get_or_compute(cache_key(*key_parts), compute, ttl)
+        print(f"Cache {'hit' if hit else 'miss'} for {action.get('type')}: {self.result_cache.stats()}")
+        return value, hit
+
+    def _render(self, value, variables: Dict[str, str], quote: Optional[Callable[[str], str]] = None):
+        """Replace {{name}} placeholders with values produced by earlier steps, passed through `quote` if given."""
+        if isinstance(value, dict):
+            return {k: self._render(v, variables, quote) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._render(v, variables, quote) for v in value]
+        if not isinstance(value, str) or "{{" not in value:
+            return value
+
+        def substitute(match):
+            name = match.group(1)
+            if name not in variables:
+                return match.group(0)
+            return quote(variables[name]) if quote else variables[name]
+
+        return re.sub(r"\{\{\s*(\w+)\s*\}\}", substitute, value)
+
+    def _copy_selection(self):
+        from pynput import keyboard
+        from pynput.keyboard import Key
+        kb = keyboard.Controller()
+
+        # Simulate Ctrl+C or Cmd+C to copy selected text
+        if platform.system() == "Darwin":  # macOS
+            with kb.pressed(Key.cmd):
+                kb.press('c')
+                kb.release('c')
+        else:  # Windows/Linux
+            with kb.pressed(Key.ctrl):
+                kb.press('c')
+                kb.release('c')
+
+        # Give a small delay for the copy operation to complete
+        time.sleep(0.1)
+
+    def _read_step_input(self, source: str, variables: Dict[str, str]) -> str:
+        if source == "none":
+            return ""
+        # Input handed in by the caller (e.g. the command line) replaces the selection/clipboard
+        if "input" in variables:
+            return variables["input"]
+        import pyperclip
+        if source == "selection":
+            self._copy_selection()
+        elif source != "clipboard":
+            return ""
+        text = pyperclip.paste()
+        self._remember_clipboard(text)
+        return text
+
+    def _paste_clipboard(self):
+        from pynput import keyboard
+        from pynput.keyboard import Key
+        kb = keyboard.Controller()
+        if platform.system() == "Darwin":  # macOS
+            with kb.pressed(Key.cmd):
+                kb.press('v')
+                kb.release('v')
+        else:  # Windows/Linux
+            with kb.pressed(Key.ctrl):
+                kb.press('v')
+                kb.release('v')
+
+    def _remember_clipboard(self, text: str):
+        # Record clipboard contents the daemon already has in hand; never read the clipboard just for history
+        if self.clipboard_history is not None and text:
+            self.clipboard_history.add(text)
+
+    def _find_history_entry(self, value, match: str) -> Optional[str]:
+        if self.clipboard_history is None:
+            print("Clipboard history is not enabled")
+            return None
+        if isinstance(value, int) or str(value).strip().isdigit():
+            return self.clipboard_history.get(int(value))
+        results = self.clipboard_history.search(str(value), prefix=match == "prefix", limit=1)
+        return results[0][1] if results else None
+
+    def _on_clipboard_change(self):
+        # Runs on the watcher thread, off the keyboard input path
+        import pyperclip
+        text = pyperclip.paste()
+        if text != self._last_written_clipboard:
+            self._remember_clipboard(text)
+
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self._schedule_executor.shutdown(wait=False, cancel_futures=True)
+        if self.key_state is not None:
+            self.key_state.stop()
+            print(f"Key state: {self.key_state.stats()}")
+        self.command_pool.close()
+        self.http_pool.close()
+        print(f"Result cache: {self.result_cache.stats()}")
+        if self.clipboard_history is not None:
+            print(f"Clipboard history: {self.clipboard_history.stats()}")
+        self.result_cache.close()
+        for line in self.delay_calibrator.report():
+            print(f"Step timings: {line}")
+
+    def _wait_for_app_launch(self, app_name, timeout=10, settle=0.5, started_at=None):
+        """Wait for an application to fully launch on macOS.
+
+        Returns the seconds from `started_at` until the app was running and
+        frontmost, or None on timeout.
+        """
         print(f"Waiting for {app_name} to launch...")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        start_time = time.monotonic()
+        started_at = started_at or start_time
+        while time.monotonic() - start_time < timeout:
             try:
-                # Check if the app is running and responding
+                # Check if the app is running and focused
                 if platform.system() == "Darwin":  # macOS
                     result = subprocess.run(
-                        ["osascript", "-e", f'tell application "System Events" to (name of processes) contains "{app_name}"'],
+                        ["osascript", "-e",
+                         f'tell application "System Events" to ((name of processes) contains "{app_name}") '
+                         f'and (frontmost of process "{app_name}")'],
                         capture_output=True, text=True
                     )
                     if "true" in result.stdout.lower():
+                        ready_after = time.monotonic() - started_at
                         # Give the app a moment to fully initialize its UI
-                        time.sleep(0.5)
+                        time.sleep(settle)
                         print(f"{app_name} is now running")
-                        return True
+                        return ready_after
                 else:  # Linux
                     result = subprocess.run(
                         ["pgrep", "-f", app_name],
                         capture_output=True, text=True
                     )
                     if result.stdout.strip():
-                        time.sleep(0.5)
+                        ready_after = time.monotonic() - started_at
+                        time.sleep(settle)
                         print(f"{app_name} is now running")
-                        return True
+                        return ready_after
                 
                 time.sleep(0.2)  # Short delay between checks
             except Exception as e:
                 print(f"Error checking app status: {e}")
         
         print(f"Timed out waiting for {app_name} to launch")
-        return False
+        return None
 
-    def _wait_for_process(self, pid, timeout=10):
-        """Wait for a process to fully initialize on Windows."""
+    def _wait_for_process(self, pid, timeout=10, settle=1.0, started_at=None):
+        """Wait for a process to fully initialize on Windows.
+
+        Returns the seconds from `started_at` until the process owned the
+        foreground window, or None on timeout.
+        """
         print(f"Waiting for process {pid} to initialize...")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        start_time = time.monotonic()
+        started_at = started_at or start_time
+        while time.monotonic() - start_time < timeout:
             try:
                 if platform.system() == "Windows":
-                    # Check if the process is responding
-                    result = subprocess.run(
-                        ["tasklist", "/FI", f"PID eq {pid}", "/NH"],
-                        capture_output=True, text=True
-                    )
-                    if str(pid) in result.stdout:
+                    import ctypes
+                    from ctypes import wintypes
+                    # The PID shows up almost at once; the app is ready when its window has focus
+                    user32 = ctypes.windll.user32
+                    hwnd = user32.GetForegroundWindow()
+                    owner = wintypes.DWORD()
+                    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(owner))
+                    if hwnd and owner.value == pid:
+                        ready_after = time.monotonic() - started_at
                         # Give the app a moment to fully initialize its UI
-                        time.sleep(1.0)
-                        print(f"Process {pid} is now running")
-                        return True
+                        time.sleep(settle)
+                        print(f"Process {pid} is now running and focused")
+                        return ready_after
                 
                 time.sleep(0.2)  # Short delay between checks
             except Exception as e:
                 print(f"Error checking process status: {e}")
         
         print(f"Timed out waiting for process {pid} to initialize")
-        return False
+        return None
+
+def parse_job(line: str) -> dict:
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON job: {e}")
+    if not isinstance(job, dict):
+        raise ValueError(f"Job must be a JSON object, got {type(job).__name__}")
+    return job
+
+
+def run_job(manager: SmartActionManager, job) -> dict:
+    """Run one CLI job, or one batch line, and describe the outcome as a JSON-friendly dict."""
+    name = ""
+    start_time = time.perf_counter()
+    try:
+        # A bad batch line only fails its own job
+        if isinstance(job, str):
+            job = parse_job(job)
+        name = job.get("action", "")
+        if not isinstance(job.get("variables", {}), dict):
+            raise ValueError("variables must be a JSON object")
+        variables = dict(job.get("variables", {}))
+        if job.get("input") is not None:
+            variables["input"] = job["input"]
+        # Step progress goes to stderr so stdout only carries the results
+        with contextlib.redirect_stdout(sys.stderr):
+            manager.run_action(name, variables)
+        result = {"action": name, "ok": True, "variables": variables}
+    except Exception as e:
+        result = {"action": name, "ok": False, "error": str(e)}
+    result["ms"] = round((time.perf_counter() - start_time) * 1000, 3)
+    return result
+
+
+def run_cli(args) -> int:
+    # Config is loaded and workers are started once for every job that follows
+    with contextlib.redirect_stdout(sys.stderr):
+        manager = SmartActionManager()
+
+    failures = 0
+    try:
+        if args.command == "run":
+            variables = dict(item.split("=", 1) for item in args.var)
+            input_text = args.input
+            if input_text is None and not sys.stdin.isatty():
+                input_text = sys.stdin.read()
+            jobs = [{"action": args.name, "input": input_text, "variables": variables}]
+        else:
+            jobs = (line for line in sys.stdin if line.strip())
+
+        batch_start = time.perf_counter()
+        count = 0
+        for job in jobs:
+            result = run_job(manager, job)
+            failures += not result["ok"]
+            count += 1
+            print(json.dumps(result), flush=True)
+        if args.command == "batch":
+            total_ms = (time.perf_counter() - batch_start) * 1000
+            print(f"Ran {count} jobs in {total_ms:.1f} ms ({failures} failed)", file=sys.stderr)
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            manager.close()
+    return 1 if failures else 0
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Smart Actions daemon and command line runner")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="run one action by name and exit")
+    run_parser.add_argument("name", help="action name from smart_actions.json")
+    run_parser.add_argument("--input", help="text used instead of the selection/clipboard (default: stdin when piped)")
+    run_parser.add_argument("--var", action="append", default=[], metavar="NAME=VALUE",
+                            help="set a {{NAME}} variable before the first step")
+    subparsers.add_parser("batch", help='run JSON lines like {"action": "...", "input": "..."} from stdin')
+    args = parser.parse_args()
+    if args.command == "run" and any("=" not in item for item in args.var):
+        parser.error("--var expects NAME=VALUE")
+
+    if args.command:
+        sys.exit(run_cli(args))
+
     if os.geteuid() != 0 and platform.system() == "Darwin":
         print("Warning: This script may require sudo privileges on macOS for keyboard events.")
         print("Try running with: sudo python main.py")
@@ -370,9 +1018,11 @@ def main():
     
     # Keep the program running
     try:
-        keyboard.Listener.join(manager.listener)
+        manager.listener.join()
     except KeyboardInterrupt:
         print("\nExiting...")
+    finally:
+        manager.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+
+def cache_key(*parts) -> str:
+    """Stable hash of a step's configuration and its inputs."""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class ResultCache:
+    """Bounded in-memory LRU with per-entry TTL, optionally backed by SQLite on disk."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._open_disk(os.path.expanduser(path))
+
+    def _open_disk(self, path: str):
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires REAL, value TEXT)")
+            self._db.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Error opening result cache {path}: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires, value FROM results WHERE key = ? AND expires >= ?",
+                    (key, now)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                     (key, expires, value))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing result cache: {e}")
+
+    def _remember(self, key: str, expires: float, value: str):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], ttl: Optional[float] = None) -> Tuple[str, bool]:
+        """Return (value, hit). The lock is not held while computing."""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value, ttl)
+        return value, False
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (f"hits={self.hits} (disk {self.disk_hits}) misses={self.misses} "
+                f"hit rate={rate:.0f}% entries={len(self._entries)}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Set
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, now: float) -> Optional[float]:
+        return now + self.seconds
+
+
+class OneShotTrigger:
+    def __init__(self, at: datetime):
+        self.timestamp = at.timestamp()
+
+    def next_after(self, now: float) -> Optional[float]:
+        # Fire once; a time that already passed while the daemon was down is skipped
+        return self.timestamp if self.timestamp > now else None
+
+
+class CronTrigger:
+    """Five-field cron expression: minute hour day-of-month month day-of-week."""
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        parsed = [self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Both 0 and 7 mean Sunday; convert to Python's Monday=0 numbering
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        # Like Vixie cron, a field starting with "*" (including "*/2") counts as unrestricted
+        self.days_restricted = not fields[2].startswith("*")
+        self.weekdays_restricted = not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(value) for value in part.split("-", 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        in_days = day.day in self.days
+        in_weekdays = day.weekday() in self.weekdays
+        # Like cron: when both fields are restricted, either one matching is enough
+        if self.days_restricted and self.weekdays_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, now: float) -> Optional[float]:
+        moment = datetime.fromtimestamp(now).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        # Skip whole months, days and hours that cannot match instead of testing every minute
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        return None
+
+
+def parse_trigger(schedule: dict):
+    if not isinstance(schedule, dict):
+        raise ValueError(f"Schedule must be an object such as {{\"every\": 60}}: {schedule!r}")
+    try:
+        if "every" in schedule:
+            return IntervalTrigger(float(schedule["every"]))
+        if "cron" in schedule:
+            return CronTrigger(str(schedule["cron"]))
+        if "at" in schedule:
+            return OneShotTrigger(datetime.fromisoformat(str(schedule["at"])))
+    except TypeError as e:
+        raise ValueError(f"Invalid schedule {schedule}: {e}")
+    raise ValueError(f"Schedule needs 'every', 'cron' or 'at': {schedule}")
+
+
+class Scheduler:
+    """One thread sleeping on a heap of deadlines; it wakes only when the earliest one is due."""
+
+    def __init__(self, dispatch: Callable[[str], None]):
+        self.dispatch = dispatch
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def add(self, action_name: str, trigger):
+        next_time = trigger.next_after(time.time())
+        if next_time is None:
+            print(f"Schedule for {action_name} never fires (a date that does not exist or a time in the past), "
+                  f"ignoring it")
+            return
+        entry = (next_time, next(self._counter), action_name, trigger)
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            # Only wake the thread if the new job is now the earliest one
+            if self._heap[0] is entry:
+                self._condition.notify()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def start(self):
+        if self._thread is None and self._heap:
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.time()):
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                due_time, _, action_name, trigger = heapq.heappop(self._heap)
+                # Schedule the next run from the planned time so intervals do not drift,
+                # but skip runs that were missed (e.g. while the machine was asleep)
+                now = time.time()
+                next_time = trigger.next_after(due_time)
+                if next_time is not None and next_time <= now:
+                    next_time = trigger.next_after(now)
+                if next_time is not None:
+                    heapq.heappush(self._heap, (next_time, next(self._counter), action_name, trigger))
+            try:
+                self.dispatch(action_name)
+            except Exception as e:
+                print(f"Error dispatching scheduled action {action_name}: {e}")
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
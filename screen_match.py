@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+
+_references: Dict[str, Tuple[float, np.ndarray]] = {}
+_references_lock = threading.Lock()
+
+
+def load_reference(path: str) -> np.ndarray:
+    """Decode a reference image once and reuse it until the file changes."""
+    path = os.path.expanduser(path)
+    mtime = os.path.getmtime(path)
+    with _references_lock:
+        cached = _references.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert("RGB"), dtype=np.int16)
+    with _references_lock:
+        _references[path] = (mtime, pixels)
+    return pixels
+
+
+def parse_color(color) -> np.ndarray:
+    if isinstance(color, str):
+        color = color.lstrip("#")
+        color = [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+    return np.array(color[:3], dtype=np.int16)
+
+
+def capture_region(x: int, y: int, width: int, height: int) -> np.ndarray:
+    """Grab only the given screen rectangle as an (height, width, 3) array."""
+    image = ImageGrab.grab(bbox=(x, y, x + width, y + height))
+    return np.asarray(image.convert("RGB"), dtype=np.int16)
+
+
+def match_score(region: np.ndarray, reference: np.ndarray, tolerance: int) -> float:
+    """Fraction of pixels whose largest channel difference is within `tolerance`."""
+    if region.shape != reference.shape:
+        return 0.0
+    difference = np.abs(region - reference).max(axis=2)
+    return float(np.count_nonzero(difference <= tolerance)) / difference.size
+
+
+def wait_until(check: Callable[[], bool], timeout: float, min_interval: float = 0.02,
+               max_interval: float = 0.25, duty: float = 0.2) -> bool:
+    """Poll `check` until it passes or `timeout` expires.
+
+    The interval starts short so a screen that is already ready resolves quickly,
+    then backs off while it keeps failing and never lets capture+compare use
+    more than `duty` of the wall time.
+    """
+    deadline = time.monotonic() + timeout
+    interval = min_interval
+    while True:
+        started = time.monotonic()
+        if check():
+            return True
+        cost = time.monotonic() - started
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        # The duty floor comes last so a slow capture is never polled faster than it allows
+        interval = max(min(max_interval, interval * 1.5), cost / duty)
+        time.sleep(min(interval, remaining))
+
+
+def wait_for_image(path: str, x: int, y: int, timeout: float = 10.0, tolerance: int = 16,
+                   threshold: float = 0.98, size: Optional[Sequence[int]] = None) -> bool:
+    reference = load_reference(path)
+    height, width = reference.shape[:2]
+    if size is not None and tuple(size) != (width, height):
+        raise ValueError(f"Region {size[0]}x{size[1]} does not match {path} ({width}x{height})")
+    return wait_until(lambda: match_score(capture_region(x, y, width, height), reference, tolerance) >= threshold,
+                      timeout)
+
+
+def wait_for_pixel(x: int, y: int, color, timeout: float = 10.0, tolerance: int = 16) -> bool:
+    expected = parse_color(color)
+    return wait_until(lambda: int(np.abs(capture_region(x, y, 1, 1)[0, 0] - expected).max()) <= tolerance,
+                      timeout)
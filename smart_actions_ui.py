@@ -17,7 +17,7 @@ class ActionStepDialog(QDialog):
         
         # Step type selection
         self.type_combo = QComboBox()
-        self.type_combo.addItems(["open_app", "open_url", "keyboard", "clipboard", "delay"])
+        self.type_combo.addItems(["open_app", "open_url", "keyboard", "clipboard", "delay", "run_command", "http_request"])
         self.type_combo.currentTextChanged.connect(self.on_type_changed)
         layout.addRow("Type:", self.type_combo)
         
@@ -124,6 +124,10 @@ class ActionStepDialog(QDialog):
                 self.value_input.setPlaceholderText("Enter application name")
             elif text == "open_url":
                 self.value_input.setPlaceholderText("Enter URL (e.g. https://example.com)")
+            elif text == "run_command":
+                self.value_input.setPlaceholderText("Enter command (clipboard is passed on stdin)")
+            elif text == "http_request":
+                self.value_input.setPlaceholderText("Enter URL (e.g. http://localhost:8000/v1/chat)")
     
     def on_clipboard_action_changed(self, action):
         if action == "copy":
@@ -312,6 +316,8 @@ class SmartActionsUI(QMainWindow):
             with open("smart_actions.json", "r") as f:
                 data = json.load(f)
                 self.actions = data.get("actions", [])
+                # Keep daemon settings (e.g. cache) so saving does not drop them
+                self.settings = data.get("settings")
                 
             self.action_list.clear()
             for action in self.actions:
@@ -319,11 +325,15 @@ class SmartActionsUI(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error loading actions: {str(e)}")
             self.actions = []
+            self.settings = None
     
     def save_actions(self):
         try:
+            data = {"actions": self.actions}
+            if self.settings:
+                data["settings"] = self.settings
             with open("smart_actions.json", "w") as f:
-                json.dump({"actions": self.actions}, f, indent=2)
+                json.dump(data, f, indent=2)
             
             # Restart Smart Actions after saving changes
             if self.process.state() == QProcess.ProcessState.Running:
@@ -439,8 +449,12 @@ class SmartActionsUI(QMainWindow):
                     dialog.clipboard_action_combo.setCurrentText(step_data["clipboard_action"])
                 
                 if dialog.exec():
-                    # Update the step with new data
-                    action["steps"][current_step] = dialog.get_step_data()
+                    # Update the step with new data, keeping extra settings
+                    # (e.g. timeout) that the dialog does not edit
+                    new_step = dialog.get_step_data()
+                    if new_step["type"] == step_data["type"]:
+                        new_step = {**step_data, **new_step}
+                    action["steps"][current_step] = new_step
                     
                     # Update the display
                     updated_step = action["steps"][current_step]
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+
+class AbbreviationMatcher:
+    """Aho–Corasick automaton over all abbreviations, fed one typed character at a time.
+
+    Each keystroke follows at most a few failure links (O(1) amortized), no
+    matter how many abbreviations are loaded. Backspace is handled by keeping the
+    recent states, bounded by the longest abbreviation.
+    """
+
+    def __init__(self, abbreviations: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.match: List[Optional[str]] = [None]
+        self.longest = 0
+        for abbreviation in abbreviations:
+            self._add(abbreviation)
+        self._build()
+        self.state = 0
+        self._history: Deque[int] = deque(maxlen=max(1, self.longest))
+
+    def _add(self, abbreviation: str):
+        if not abbreviation:
+            return
+        state = 0
+        for ch in abbreviation:
+            next_state = self.goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.match.append(None)
+                self.goto[state][ch] = next_state
+            state = next_state
+        self.match[state] = abbreviation
+        self.longest = max(self.longest, len(abbreviation))
+
+    def _build(self):
+        # Breadth-first so every failure link points at an already finished state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                # A state also completes any abbreviation that is a suffix of it
+                if self.match[next_state] is None:
+                    self.match[next_state] = self.match[self.fail[next_state]]
+                queue.append(next_state)
+
+    def feed(self, ch: str) -> Optional[str]:
+        """Advance by one typed character and return the abbreviation it completes, if any."""
+        self._history.append(self.state)
+        state = self.state
+        while state and ch not in self.goto[state]:
+            state = self.fail[state]
+        self.state = self.goto[state].get(ch, 0)
+        return self.match[self.state]
+
+    def backspace(self):
+        self.state = self._history.pop() if self._history else 0
+
+    def reset(self):
+        self.state = 0
+        self._history.clear()